@@ -83,11 +83,13 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'code': event['game_code']
         }))
 
-    async def join_successful(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'join_successful',
-            'username': event['username']
-        }))
+    async def roster_update(self, event):
+        if event['channel_name'] == self.channel_name:
+            await self.send(text_data=json.dumps({
+                'type': 'join_successful',
+                'username': event['new_user']
+            }))
+        await self.send(text_data=event['users_list'].decode())
 
     async def error(self, event):
         await self.send(text_data=json.dumps({
@@ -95,38 +97,16 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'msg': event['msg']
         }))
 
-    async def game_started(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'game_started',
-        }))
-
-    async def ask_question(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'question',
-            'question_id': event['question_id'],
-            'time': event['time'],
-            'question': event['question'],
-            'answers': event['answers'],
-        }))
-
-    async def show_users(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'users_list',
-            'users': event['users']
-        }))
-
     async def question_end(self, event):
         await self.send(text_data=json.dumps({
             'type': 'question_end',
             'question_id': event['question_id'],
-            'correct_answer': event['correct_answer'],
+            'correct_answer': event['results'].get(self.channel_name, False),
         }))
 
-    async def game_ended(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'quiz_end',
-            'scores': event['scores'],
-        }))
+    async def raw_message(self, event):
+        # Broadcasts arrive already JSON-encoded (as bytes) by the game, forward them as is
+        await self.send(text_data=event['raw'].decode())
 
     async def send(self, text_data=None, bytes_data=None, close=False):
         print('Sent: ' + text_data)
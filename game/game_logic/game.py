@@ -1,7 +1,8 @@
 import asyncio
+import random
 import time
 
-from asgiref.sync import sync_to_async
+import orjson
 from channels.db import database_sync_to_async
 
 from game.game_logic.player import Player
@@ -12,19 +13,31 @@ class Game:
     QUESTION_LENGTH = 10
     MAX_SCORE = 1000
     MIN_SCORE = 100
+    QUESTION_IDS_TTL = 300  # seconds
+
+    # Primary keys of all questions, shared by every game
+    _question_ids = []
+    _question_ids_time = 0
+
+    __slots__ = ('game_code', 'channel_layer', 'on_game_end', 'players', 'usernames',
+                 'running_game_task', 'current_question', 'answered', 'all_answered', 'answer_lock')
 
     def __init__(self, game_code, channel_layer, on_game_end):
         self.game_code = game_code
         self.channel_layer = channel_layer
         self.on_game_end = on_game_end
-        self.players = {}
+        self.players = {}  # {'player_channel_name': Player, ...}
+        self.usernames = set()
         self.running_game_task = None
         self.current_question = None
+        self.answered = set()  # channel names of players who answered the current question
+        self.all_answered = asyncio.Event()
+        self.answer_lock = asyncio.Lock()  # Serializes answers within this game only
 
 # Private:
 
     def _is_username_available(self, username):
-        return False if username in self.players.values() else True
+        return username not in self.usernames
 
     def _get_available_username(self, username):
         if not self._is_username_available(username):
@@ -35,17 +48,31 @@ class Game:
         return username
 
     def _get_all_scores(self):
-        return [{'user': p.username, 'score': p.total_score()} for p in self.players.values()]
+        return [{'user': p.username, 'score': p.total_score} for p in self.players.values()]
 
     def _get_all_usernames(self):
         return [p.username for p in self.players.values()]
 
+    @staticmethod
+    def _raw_message(message):
+        # Encode a broadcast once here instead of once per consumer in the group
+        return {
+            "type": "raw_message",
+            "raw": orjson.dumps(message),
+        }
+
+    def _users_list_raw(self):
+        return orjson.dumps({
+            "type": "users_list",
+            "users": self._get_all_usernames(),
+        })
+
     async def _send_list_of_users(self):
         await self.channel_layer.group_send(
             self.game_code,
             {
-                "type": "show_users",
-                "users": self._get_all_usernames(),
+                "type": "raw_message",
+                "raw": self._users_list_raw(),
             },
         )
 
@@ -58,72 +85,100 @@ class Game:
             },
         )
 
-    async def _ask_question(self, game_code, question, question_id):
+    def _check_all_answered(self):
+        if self.current_question and len(self.answered) >= len(self.players):
+            self.all_answered.set()
+
+    async def _ask_question(self, game_code, question, question_id, payload):
+        self.answered = set()
+        self.all_answered = asyncio.Event()
         self.current_question = {'id': question_id, 'correct_answer': question.correct_answer,
-                                            'length': self.QUESTION_LENGTH, 'start_time': time.time()}
+                                 'length': self.QUESTION_LENGTH, 'start_time': time.time()}
+        await self.channel_layer.group_send(game_code, payload)
+
+        # End the round early once every player has answered
+        try:
+            await asyncio.wait_for(self.all_answered.wait(), self.QUESTION_LENGTH)
+        except asyncio.TimeoutError:
+            pass
+        self.current_question = None
+        # One broadcast with everyone's result, each consumer picks its own
         await self.channel_layer.group_send(
             game_code,
             {
-                'type': 'ask_question',
+                'type': 'question_end',
                 'question_id': question_id,
-                'time': self.QUESTION_LENGTH,
-                'question': question.content,
-                'answers': question.answers
+                'results': {channel: p.is_answer_correct(question_id) for channel, p in self.players.items()},
             }
         )
 
-        await asyncio.sleep(self.QUESTION_LENGTH)
-        self.current_question = None
-        for player_channel in self.players:
-            await self.channel_layer.send(
-                player_channel,
-                {
-                    'type': 'question_end',
-                    'question_id': question_id,
-                    'correct_answer': self.players[player_channel].is_answer_correct(question_id),
-                }
-            )
+    @classmethod
+    def _fetch_random_questions(cls, amount):
+        """ Runs in a worker thread - refreshes the cached ids and loads the questions in one hop """
+        if not cls._question_ids or time.time() - cls._question_ids_time > cls.QUESTION_IDS_TTL:
+            cls._question_ids = list(Question.objects.values_list('pk', flat=True))
+            cls._question_ids_time = time.time()
+        ids = random.sample(cls._question_ids, min(amount, len(cls._question_ids)))
+        questions = list(Question.objects.filter(pk__in=ids))
+        random.shuffle(questions)
+        return questions
 
     async def _get_random_questions(self, amount):
-        questions = await database_sync_to_async(Question.objects.all().order_by)('?')
-        random_questions = await sync_to_async(list)(questions[:amount])
-        return random_questions
+        return await database_sync_to_async(self._fetch_random_questions)(amount)
 
     async def _run_game(self):
         await self.channel_layer.group_send(
             self.game_code,
-            {
+            self._raw_message({
                 'type': 'game_started',
-            }
+            })
         )
 
         questions = await self._get_random_questions(3)
-
-        for i, q in enumerate(questions):
-            await self._ask_question(self.game_code, q, i)
+        # Build every question payload once, before the first round starts
+        payloads = [
+            self._raw_message({
+                'type': 'question',
+                'question_id': i,
+                'time': self.QUESTION_LENGTH,
+                'question': q.content,
+                'answers': tuple(q.answers),
+            })
+            for i, q in enumerate(questions)
+        ]
+
+        for i, (q, payload) in enumerate(zip(questions, payloads)):
+            await self._ask_question(self.game_code, q, i, payload)
             await asyncio.sleep(5)
+            if not self.players:  # Everybody left while the round was running
+                return
 
+        scores = self._get_all_scores()
         await self.channel_layer.group_send(
             self.game_code,
-            {
-                'type': 'game_ended',
-                'scores': self._get_all_scores()
-            }
+            self._raw_message({
+                'type': 'quiz_end',
+                'scores': scores
+            })
         )
         await self.on_game_end(self.game_code)
 
 # Public:
 
     async def remove_player(self, channel_name):
-        self.players.pop(channel_name)
+        players = self.players
+        player = players.pop(channel_name)
+        self.usernames.discard(player.username)
+        self.answered.discard(channel_name)
         await self.channel_layer.group_discard(self.game_code, channel_name)
 
-        if len(self.players) == 0:
+        if not players:
             if self.running_game_task:
                 self.running_game_task.cancel()
             await self.on_game_end(self.game_code)
             return
 
+        self._check_all_answered()
         # Send updated list of users attending the game
         await self._send_list_of_users()
 
@@ -132,35 +187,44 @@ class Game:
             await self._send_error(channel_name, 'Game is running already')
             return
         new_username = self._get_available_username(username)
-        self.players[channel_name] = Player(channel_name, username)
-        await self.channel_layer.send(
-            channel_name,
+        self.players[channel_name] = Player(channel_name, new_username)
+        self.usernames.add(new_username)
+        await self.channel_layer.group_add(self.game_code, channel_name)
+        # One broadcast both confirms the join and refreshes everyone's list of users
+        await self.channel_layer.group_send(
+            self.game_code,
             {
-                "type": "join_successful",
-                "username": new_username,
+                "type": "roster_update",
+                "channel_name": channel_name,
+                "new_user": new_username,
+                "users_list": self._users_list_raw(),
             },
         )
-        await self.channel_layer.group_add(self.game_code, channel_name)
-        await self._send_list_of_users()
         return new_username
 
     async def submit_answer(self, channel_name, question_id, answer):
-        if not self.current_question:
-            await self._send_error(channel_name, "There is no active question")
-            return
-        if question_id != self.current_question['id']:
-            await self._send_error(channel_name, "Wrong question id")
-            return
-        answer_time = time.time() - self.current_question['start_time']
-        if answer_time > self.current_question['length']:
-            await self._send_error(channel_name, "There is no active question")
-        # Calculate score
-        score = 0
-        if self.current_question['correct_answer'] == answer:
-            score = int((1 - answer_time/self.current_question['length']) *
-                        (self.MAX_SCORE-self.MIN_SCORE) + self.MIN_SCORE)
-        # Save answer
-        self.players[channel_name].set_answer(question_id, score)
+        async with self.answer_lock:
+            current_question = self.current_question
+            if not current_question:
+                await self._send_error(channel_name, "There is no active question")
+                return
+            if question_id != current_question['id']:
+                await self._send_error(channel_name, "Wrong question id")
+                return
+            length = current_question['length']
+            answer_time = time.time() - current_question['start_time']
+            if answer_time > length:
+                await self._send_error(channel_name, "There is no active question")
+                return
+            # Calculate score
+            score = 0
+            if current_question['correct_answer'] == answer:
+                score = int((1 - answer_time/length) * (self.MAX_SCORE-self.MIN_SCORE) + self.MIN_SCORE)
+            # Save answer
+            player = self.players.get(channel_name)  # May have left while waiting for the lock
+            if player and player.set_answer(question_id, score):
+                self.answered.add(channel_name)
+                self._check_all_answered()
 
     async def start_game(self, channel_name):
         if not self.running_game_task:
@@ -1,45 +1,72 @@
+import asyncio
 import random
 
 from channels.consumer import AsyncConsumer
 from game.game_logic.game import Game
 
 
-""" GameWorker - manages all active games """
+""" GameWorker - manages all active games
+
+Runs on uvloop when installed (see manage.py). Handlers should await channel layer
+calls directly or batch them with asyncio.gather - never spawn a task per message
+or per recipient. The only task created here is one _run_game per started game.
+"""
+
+
+def _to_int(value):
+    """ Returns value as int, or None if it is not an integer - without raising """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        digits = value[1:] if value[:1] == '-' else value
+        if digits.isdecimal():
+            return int(value)
+    return None
 
 
 class GameWorker(AsyncConsumer):
-    QUESTION_LENGTH = 10
+    MAX_GAMES = 100
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.active_games = {}
         self.current_players = {}  # {'player_channel_name': 'game_code', ...}
+        self._free_codes = list(range(self.MAX_GAMES))
+        random.shuffle(self._free_codes)
         print('GameWorker started.')
 
 # Private:
 
     def _get_new_game_code(self):
-        while True:
-            code = random.randint(0, 99)
-            if not self.active_games.get(code, None):
-                return str(code)
+        if not self._free_codes:
+            return None
+        return str(self._free_codes.pop())
+
+    def _release_game_code(self, game_code):
+        # Insert at a random position so released codes are not handed out in order
+        self._free_codes.insert(random.randint(0, len(self._free_codes)), int(game_code))
 
     async def _remove_player_from_game(self, channel_name):
-        game_code = self.current_players[channel_name]
+        current_players = self.current_players
+        game_code = current_players[channel_name]
         await self.active_games[game_code].remove_player(channel_name)
-        del self.current_players[channel_name]
+        current_players.pop(channel_name, None)
 
     async def _add_player_to_game(self, channel_name, username, game_code):
         if await self.active_games[game_code].add_player(channel_name, username):
             self.current_players[channel_name] = game_code
 
     async def _remove_game(self, game_code):
+        # Both the finished game task and the last leaving player may end a game
+        game = self.active_games.pop(game_code, None)
+        if game is None:
+            return
         print(f"Removing game {game_code}")
-        players = self.active_games[game_code].players
+        players = list(game.players)
         for p in players:
-            await self.channel_layer.group_discard(game_code, p)
-            del self.current_players[p]
-        self.active_games.pop(game_code)
+            self.current_players.pop(p, None)
+        self._release_game_code(game_code)
+        await asyncio.gather(*(self.channel_layer.group_discard(game_code, p) for p in players))
 
     async def _send_error(self, channel_name, msg):
         await self.channel_layer.send(
@@ -55,12 +82,15 @@ class GameWorker(AsyncConsumer):
     async def create_game(self, event):
         channel_name = event['channel_name']
         username = event['username']
-        game_code = self._get_new_game_code()
 
         # Data validation
         if not username:
             await self._send_error(channel_name, "Some data is missing!")
             return
+        game_code = self._get_new_game_code()
+        if game_code is None:
+            await self._send_error(channel_name, "Server is full, try again later")
+            return
         # Drop player from a game if is playing already
         if channel_name in self.current_players:
             await self._remove_player_from_game(channel_name)
@@ -86,8 +116,9 @@ class GameWorker(AsyncConsumer):
         if not username or game_code is None:
             await self._send_error(channel_name, "Some data is missing")
             return
-        if channel_name in self.current_players:
-            if self.current_players[channel_name] == game_code:
+        current_game_code = self.current_players.get(channel_name)
+        if current_game_code is not None:
+            if current_game_code == game_code:
                 await self._send_error(channel_name, 'You are in this game already')
                 return
             await self._remove_player_from_game(channel_name)
@@ -111,35 +142,35 @@ class GameWorker(AsyncConsumer):
 
     async def submit_answer(self, event):
         channel_name = event['channel_name']
+        game_code = self.current_players.get(channel_name)
 
         # Data validation
-        if channel_name not in self.current_players:
+        if game_code is None:
             await self._send_error(channel_name, "You are not in a game")
             return
         # TODO: Better error messages
-        try:
-            question_id = int(event['question_id'])
-        except Exception as e:
+        question_id = _to_int(event['question_id'])
+        if question_id is None:
             await self._send_error(channel_name, "Question id is not a number")
             return
-        try:
-            answer = int(event['answer'])
-        except Exception as e:
+        answer = _to_int(event['answer'])
+        if answer is None:
             await self._send_error(channel_name, "Wrong answer format")
             return
 
         # Submit answer
-        game_code = self.current_players[channel_name]
-        await self.active_games[game_code].submit_answer(channel_name, question_id, answer)
+        game = self.active_games[game_code]
+        await game.submit_answer(channel_name, question_id, answer)
 
     async def start_game(self, event):
         channel_name = event['channel_name']
+        game_code = self.current_players.get(channel_name)
 
         # Data validation
-        if channel_name not in self.current_players:
+        if game_code is None:
             await self._send_error(channel_name, "You are not in a game")
             return
 
         # Start game
-        game_code = self.current_players[channel_name]
-        await self.active_games[game_code].start_game(channel_name)
+        game = self.active_games[game_code]
+        await game.start_game(channel_name)
@@ -1,19 +1,20 @@
 
 class Player:
+    __slots__ = ('channel_name', 'username', 'scores', 'total_score')
+
     def __init__(self, channel_name, username):
         self.channel_name = channel_name
         self.username = username
-        self.scores = {}  # self.answers[question_id] = score
+        self.scores = {}  # self.scores[question_id] = score
+        self.total_score = 0  # Kept equal to sum(self.scores.values())
 
     def set_answer(self, question_id, score):
-        if not self.scores.get(question_id, None):
+        if question_id not in self.scores:
             self.scores[question_id] = score
+            self.total_score += score
             return True
         return False
 
-    def total_score(self):
-        return sum(self.scores.values())
-
     def is_answer_correct(self, question_id):
         return True if self.scores.get(question_id, 0) > 0 else False
 
@@ -7,6 +7,12 @@ import sys
 def main():
     """Run administrative tasks."""
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quiz.settings')
+    # Run workers (e.g. game-manager) on uvloop when it is available
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
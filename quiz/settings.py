@@ -147,6 +147,10 @@ CHANNEL_LAYERS = {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
         'CONFIG': {
             "hosts": [os.environ.get('REDIS_URL', 'redis://localhost:6379')],
+            # Game traffic is bursty (a whole game receives a question at once) and
+            # short-lived, so allow deeper channel queues but drop stale messages sooner
+            "capacity": 1500,
+            "expiry": 10,
         },
     },
 }